@@ -32,16 +32,42 @@ func notifyHandler(w http.ResponseWriter, r *http.Request) {
 	}
 
 	// 受け取ったデータをログに出力
-	log.Printf("利益検出: %s %s 利益率 %.2f%% (%.2f USDT) (volatility=%.2f%%, slippage=%.4f, trend=%s, threshold=%.2f%%)",
-		req.Triangle, req.Direction, req.ProfitRate, req.ProfitUSDT, req.Volatility, req.Slippage, req.Trend, req.Threshold)
+	logNotification(req)
 
 	// 成功レスポンスを返す
 	w.WriteHeader(http.StatusOK)
 	fmt.Fprintf(w, "通知を受け取りました")
 }
 
+// notifyBatchHandler は Python 側でまとめられた複数の通知を1リクエストで受け取る
+func notifyBatchHandler(w http.ResponseWriter, r *http.Request) {
+	if r.Method != http.MethodPost {
+		http.Error(w, "Method not allowed", http.StatusMethodNotAllowed)
+		return
+	}
+
+	var reqs []NotifyRequest
+	if err := json.NewDecoder(r.Body).Decode(&reqs); err != nil {
+		http.Error(w, "Invalid request body", http.StatusBadRequest)
+		return
+	}
+
+	for _, req := range reqs {
+		logNotification(req)
+	}
+
+	w.WriteHeader(http.StatusOK)
+	fmt.Fprintf(w, "%d 件の通知を受け取りました", len(reqs))
+}
+
+func logNotification(req NotifyRequest) {
+	log.Printf("利益検出: %s %s 利益率 %.2f%% (%.2f USDT) (volatility=%.2f%%, slippage=%.4f, trend=%s, threshold=%.2f%%)",
+		req.Triangle, req.Direction, req.ProfitRate, req.ProfitUSDT, req.Volatility, req.Slippage, req.Trend, req.Threshold)
+}
+
 func main() {
 	http.HandleFunc("/notify", notifyHandler)
+	http.HandleFunc("/notify/batch", notifyBatchHandler)
 	log.Println("Go サーバーをポート 8080 で起動します...")
 	if err := http.ListenAndServe(":8080", nil); err != nil {
 		log.Fatalf("サーバー起動エラー: %v", err)
@@ -1,15 +1,23 @@
 import ccxt
-import pandas as pd
+import numpy as np
+from numba import njit
 import os
 import logging
+import asyncio
 from logging.handlers import RotatingFileHandler
 from dotenv import load_dotenv
 import time
-import websocket
-import json
+import websockets
+import uvloop
+import orjson
 import threading
-from typing import Dict, Optional, List, cast
+import queue
+from collections import deque
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Deque, Dict, NamedTuple, Optional, List, Tuple, cast
 import requests
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger('arbitrage_live')
 logger.setLevel(logging.INFO)
@@ -36,71 +44,173 @@ binance = ccxt.binance({
 })
 binance.set_sandbox_mode(False)  # 本番環境用
 
+RING_SIZE = 10  # 保持する確定足の本数 (SMA の期間を兼ねる)
+VOLATILITY_WINDOW = 5  # ボラティリティ計算に使う確定足の本数
+TRIANGLES = {
+    "BTC-ETH-USDT": ['BTC/USDT', 'ETH/BTC', 'ETH/USDT'],
+    "BNB-BTC-USDT": ['BNB/BTC', 'BTC/USDT', 'BNB/USDT']
+}
+PAIRS = ['BTC/USDT', 'ETH/BTC', 'ETH/USDT', 'BNB/BTC', 'BNB/USDT']
+SYM = {pair: pair.replace('/', '').lower() for pair in PAIRS}  # 例: 'BTC/USDT' -> 'btcusdt'
+SYMBOL_IDS = {symbol: i for i, symbol in enumerate(SYM.values())}
+# 三角形ごとのペア順に並べたシンボル ID
+TRIANGLE_INDICES = {triangle: np.array([SYMBOL_IDS[SYM[pair]] for pair in pairs])
+                    for triangle, pairs in TRIANGLES.items()}
+
+class RingCloses:
+    """全シンボルの確定足の終値をリングバッファで保持する
+
+    終値は (シンボル数, RING_SIZE) の連続した float64 配列で、行はシンボル ID (SYMBOL_IDS) に対応する。
+    トレンド・ボラティリティ判定は終値しか読まないので、他の OHLCV は保持しない。SMA 用の終値合計と、
+    ボラティリティ用の窓内最小/最大 (単調 deque) は確定足ごとに O(1) で更新する。
+    deque は書き手 (WebSocket スレッド) 専用で、読み手には extremes の (最小, 最大) タプルを
+    1回の代入で差し替えて公開する。
+    """
+
+    def __init__(self, n_symbols: int, size: int = RING_SIZE):
+        self.size = size
+        shape = (n_symbols, size)
+        self.closes = np.zeros(shape, dtype=np.float64)
+        self.heads = np.zeros(n_symbols, dtype=np.int64)  # 次に書き込む位置 (単調増加)
+        self.counts = np.zeros(n_symbols, dtype=np.int64)  # 有効な要素数
+        self.sma_sums = np.zeros(n_symbols, dtype=np.float64)  # バッファ内の終値合計
+        # (終値, 窓から外れる head) を保持する単調 deque
+        self.min_queues: List[Deque[Tuple[float, int]]] = [deque() for _ in range(n_symbols)]
+        self.max_queues: List[Deque[Tuple[float, int]]] = [deque() for _ in range(n_symbols)]
+        # 読み手向けの窓内 (最小, 最大)。更新途中の deque を読ませないよう要素ごと差し替える
+        self.extremes: List[Tuple[float, float]] = [(0.0, 0.0)] * n_symbols
+
+    def append(self, sym_id: int, c: float) -> None:
+        head = int(self.heads[sym_id])
+        i = head % self.size
+        evicted = self.closes[sym_id, i] if self.counts[sym_id] == self.size else 0.0
+        self.sma_sums[sym_id] += c - evicted
+
+        expiry = head + VOLATILITY_WINDOW
+        min_queue = self.min_queues[sym_id]
+        while min_queue and min_queue[-1][0] >= c:
+            min_queue.pop()
+        min_queue.append((c, expiry))
+        while min_queue[0][1] <= head:
+            min_queue.popleft()
+        max_queue = self.max_queues[sym_id]
+        while max_queue and max_queue[-1][0] <= c:
+            max_queue.pop()
+        max_queue.append((c, expiry))
+        while max_queue[0][1] <= head:
+            max_queue.popleft()
+        self.extremes[sym_id] = (min_queue[0][0], max_queue[0][0])
+
+        self.closes[sym_id, i] = c
+        # head は最後に進めるので、ロックなしの読み手が配列の書きかけの要素を参照することはない
+        self.heads[sym_id] = head + 1
+        self.counts[sym_id] = min(self.counts[sym_id] + 1, self.size)
+
+    def latest_close(self, sym_id: int) -> float:
+        return float(self.closes[sym_id, (self.heads[sym_id] - 1) % self.size])
+
+@dataclass(slots=True)
+class TickSnapshot:
+    """全シンボルの最良気配 (裁定ループでは1つのインスタンスを使い回す)"""
+    bid_btcusdt: float = 0.0
+    ask_btcusdt: float = 0.0
+    bid_ethbtc: float = 0.0
+    ask_ethbtc: float = 0.0
+    bid_ethusdt: float = 0.0
+    ask_ethusdt: float = 0.0
+    bid_bnbbtc: float = 0.0
+    ask_bnbbtc: float = 0.0
+    bid_bnbusdt: float = 0.0
+    ask_bnbusdt: float = 0.0
+
+    def load(self, books: Dict[str, Dict[str, float]]) -> bool:
+        """order_books から全シンボルの気配値を取り込む (揃っていなければ False)"""
+        btcusdt = books.get('btcusdt')
+        ethbtc = books.get('ethbtc')
+        ethusdt = books.get('ethusdt')
+        bnbbtc = books.get('bnbbtc')
+        bnbusdt = books.get('bnbusdt')
+        if btcusdt is None or ethbtc is None or ethusdt is None or bnbbtc is None or bnbusdt is None:
+            return False
+        self.bid_btcusdt = btcusdt['bid']
+        self.ask_btcusdt = btcusdt['ask']
+        self.bid_ethbtc = ethbtc['bid']
+        self.ask_ethbtc = ethbtc['ask']
+        self.bid_ethusdt = ethusdt['bid']
+        self.ask_ethusdt = ethusdt['ask']
+        self.bid_bnbbtc = bnbbtc['bid']
+        self.ask_bnbbtc = bnbbtc['ask']
+        self.bid_bnbusdt = bnbusdt['bid']
+        self.ask_bnbusdt = bnbusdt['ask']
+        return True
+
+# TickSnapshot から三角形のペア順 (p0_bid, p0_ask, p1_bid, p1_ask, p2_bid, p2_ask) で取り出す
+TRIANGLE_LEGS = {triangle: attrgetter(*(f"{side}_{SYM[pair]}" for pair in pairs for side in ('bid', 'ask')))
+                 for triangle, pairs in TRIANGLES.items()}
+
 # WebSocket データを保持するグローバル変数
+# 値の差し替えは GIL 下でアトミックなのでロックは使わず、読み手は1回の get でスナップショットを取る
 order_books: Dict[str, Dict[str, float]] = {}
-recent_prices: Dict[str, pd.DataFrame] = {}
-lock = threading.Lock()
+recent_prices = RingCloses(len(PAIRS))
+data_ready = threading.Event()  # 全シンボルの板と確定足が1度でも揃ったらセット
+update_event = threading.Event()  # 板が更新されるたびにセットし、裁定ループを起こす
+
+def _check_data_ready() -> None:
+    if all(symbol in order_books and recent_prices.counts[sym_id] for symbol, sym_id in SYMBOL_IDS.items()):
+        data_ready.set()
 
-def on_message(ws, message):
-    data = json.loads(message)
+def on_message(message):
+    data = orjson.loads(message)
+    symbol = data.get('s', '').lower()  # 例: btcusdt
     if 'e' not in data:
+        # bookTicker はイベント種別を持たず、b/a に最良気配がスカラーで入る
+        if 'b' in data and 'a' in data:
+            order_books[symbol] = {
+                'bid': float(data['b']),
+                'ask': float(data['a'])
+            }
+            update_event.set()
+            if not data_ready.is_set():
+                _check_data_ready()
         return
 
-    symbol = data['s'].replace('/', '').lower()  # 例: btcusdt
-    if data['e'] == 'depthUpdate':
-        with lock:
-            bids = data.get('b', [])
-            asks = data.get('a', [])
-            if bids and asks:
-                bid_price = bids[0][0]
-                ask_price = asks[0][0]
-                if bid_price is None or ask_price is None:
-                    logger.error(f"WebSocket: オーダーブックの価格が None です {symbol}: bid={bid_price}, ask={ask_price}")
-                    return
-                bid_price = cast(float, bid_price)
-                ask_price = cast(float, ask_price)
-                order_books[symbol] = {
-                    'bid': float(bid_price),
-                    'ask': float(ask_price)
-                }
-    elif data['e'] == 'kline':
+    if data['e'] == 'kline':
         kline = data['k']
         if kline['x']:  # 確定足のみ処理
-            with lock:
-                df = recent_prices.get(symbol, pd.DataFrame(columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']))
-                new_row = pd.DataFrame({
-                    'timestamp': [pd.to_datetime(kline['t'], unit='ms', utc=True)],
-                    'open': [float(kline['o'])],
-                    'high': [float(kline['h'])],
-                    'low': [float(kline['l'])],
-                    'close': [float(kline['c'])],
-                    'volume': [float(kline['v'])]
-                })
-                df = pd.concat([df, new_row], ignore_index=True)
-                df = df.tail(10)  # 最新10件のみ保持
-                df['bid'] = df['close'] * 0.999
-                recent_prices[symbol] = df
-
-def on_error(ws, error):
-    logger.error(f"WebSocket エラー: {error}")
-
-def on_close(ws, close_status_code, close_msg):
-    logger.info("WebSocket 接続が閉じました")
-
-def on_open(ws):
-    logger.info("WebSocket 接続が開きました")
+            recent_prices.append(SYMBOL_IDS[symbol], float(kline['c']))
+            if not data_ready.is_set():
+                _check_data_ready()
 
-def start_websocket():
-    unique_pairs = ['BTC/USDT', 'ETH/BTC', 'ETH/USDT', 'BNB/BTC', 'BNB/USDT']
+async def run_ws() -> None:
     streams = []
-    for pair in unique_pairs:
-        symbol = pair.replace('/', '').lower()
-        streams.append(f"{symbol}@depth")  # オーダーブックストリーム
+    for symbol in SYM.values():
+        streams.append(f"{symbol}@bookTicker")  # 最良気配ストリーム
         streams.append(f"{symbol}@kline_1m")  # 1分足K線ストリーム
     stream_path = '/'.join(streams)
     ws_url = f"wss://stream.binance.com:9443/ws/{stream_path}"
-    ws = websocket.WebSocketApp(ws_url, on_message=on_message, on_error=on_error, on_close=on_close, on_open=on_open)
-    ws.run_forever()
+    retry_delay = 1
+    while True:
+        try:
+            async with websockets.connect(ws_url, max_size=2**16) as ws:
+                logger.info("WebSocket 接続が開きました")
+                retry_delay = 1
+                async for message in ws:
+                    # 1件の不正なメッセージで受信を止めないよう、メッセージ単位で例外を処理する
+                    try:
+                        on_message(message)
+                    except Exception as e:
+                        logger.error(f"メッセージ処理エラー: {e}")
+        except Exception as e:
+            logger.error(f"WebSocket エラー: {e}")
+        # 切断中は古い気配値で取引しないよう板を破棄し、再接続後の bookTicker で埋め直す
+        order_books.clear()
+        logger.info(f"WebSocket 接続が閉じました。{retry_delay} 秒後に再接続します")
+        await asyncio.sleep(retry_delay)
+        retry_delay = min(retry_delay * 2, 60)
+
+def start_websocket():
+    # 受信は uvloop 上のイベントループで行い、裁定ループとは lock-free な dict で受け渡す
+    uvloop.run(run_ws())
 
 def fetch_order_book(symbol: str) -> Optional[Dict[str, float]]:
     try:
@@ -130,30 +240,28 @@ def fetch_order_book(symbol: str) -> Optional[Dict[str, float]]:
         logger.error(f"オーダーブック取得エラー {symbol}: {e}")
         return None
 
-def fetch_recent_prices(symbol: str, timeframe: str = '1m', limit: int = 10) -> pd.DataFrame:
+def fetch_recent_prices(symbol: str, timeframe: str = '1m', limit: int = 10) -> np.ndarray:
+    """OHLCV を (件数, 6) の float64 配列 [timestamp, open, high, low, close, volume] で返す"""
     try:
         ohlcv = binance.fetch_ohlcv(symbol, timeframe, limit=limit)
         used_weight = 'N/A'
         if binance.last_response_headers is not None:
             used_weight = binance.last_response_headers.get('x-mbx-used-weight-1m', 'N/A')
         logger.info(f"リクエストウェイト使用量: {used_weight} (symbol={symbol})")
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
-        df['bid'] = df['close'] * 0.999
-        return df
+        return np.asarray(ohlcv, dtype=np.float64).reshape(-1, 6)
     except Exception as e:
         logger.error(f"価格取得エラー {symbol}: {e}")
-        return pd.DataFrame()
+        return np.empty((0, 6), dtype=np.float64)
 
-def check_volatility(df: pd.DataFrame, index: int) -> float:
-    start = max(0, index - 4)
-    prices = df['close'][start:index + 1]
-    return (max(prices) - min(prices)) / min(prices) * 100 if len(prices) > 1 else 0
+def check_volatility(sym_id: int) -> float:
+    if recent_prices.counts[sym_id] < 2:
+        return 0
+    low, high = recent_prices.extremes[sym_id]
+    return (high - low) / low * 100
 
-def get_trend(df: pd.DataFrame, index: int) -> str:
-    start = max(0, index - 9)
-    sma = df['close'][start:index + 1].mean()
-    current_price = df['bid'][index]
+def get_trend(sym_id: int) -> str:
+    sma = recent_prices.sma_sums[sym_id] / recent_prices.counts[sym_id]
+    current_price = recent_prices.latest_close(sym_id) * 0.999
     return "up" if current_price > sma else "down"
 
 def calculate_slippage(amount: float, volatility: float) -> float:
@@ -161,6 +269,19 @@ def calculate_slippage(amount: float, volatility: float) -> float:
     volatility_factor = 1 + (volatility / 10)
     return min(base_slippage * volatility_factor, 0.01)
 
+@njit(cache=True)
+def compute_profits(p0_bid: float, p0_ask: float, p1_bid: float, p1_ask: float, p2_bid: float, p2_ask: float,
+                    start_usdt: float, slippage: float, fee: float) -> Tuple[float, float]:
+    """三角形のペア順 [p0, p1, p2] の気配値から両方向の利益率 (%) を返す"""
+    up = 1 + slippage
+    dn = 1 - slippage
+    fee3 = fee * fee * fee
+    # 順方向: p0 を ask で買い → p1 を ask で買い → p2 を bid で売り
+    final_usdt = start_usdt / (p0_ask * up) / (p1_ask * up) * p2_bid * dn * fee3
+    # 逆方向: p2 を ask で買い → p1 を bid で売り → p0 を bid で売り
+    final_usdt_reverse = start_usdt / (p2_ask * up) * p1_bid * dn * p0_bid * dn * fee3
+    return (final_usdt - start_usdt) / start_usdt * 100, (final_usdt_reverse - start_usdt) / start_usdt * 100
+
 def calculate_dynamic_threshold(profit_rates: List[float], volatility: float) -> float:
     base = 0.12
     positive_rates = [r for r in profit_rates[-10:] if r > 0]
@@ -169,9 +290,16 @@ def calculate_dynamic_threshold(profit_rates: List[float], volatility: float) ->
         base += recent_mean * 0.3
     return max(base, 0.12) + (0.2 if volatility > 1 else 0.05)
 
+# Go サーバーへの通知は接続を使い回す (リトライは post_notifications 側で行う)
+NOTIFY_URL = "http://localhost:8080/notify"
+NOTIFY_BATCH_INTERVAL = 0.01  # 通知をまとめる待ち時間 (秒)
+notify_session = requests.Session()
+notify_session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+notify_queue: "queue.SimpleQueue[Dict[str, object]]" = queue.SimpleQueue()
+
 def notify_go_server(triangle: str, direction: str, profit_rate: float, profit_usdt: float, volatility: float, slippage: float, trend: str, threshold: float) -> None:
-    url = "http://localhost:8080/notify"
-    data = {
+    # 送信は notify_worker がまとめて行うので、ここではキューに積むだけ
+    notify_queue.put({
         "triangle": triangle,
         "direction": direction,
         "profit_rate": profit_rate,
@@ -180,111 +308,116 @@ def notify_go_server(triangle: str, direction: str, profit_rate: float, profit_u
         "slippage": slippage,
         "trend": trend,
         "threshold": threshold
-    }
+    })
+
+def post_notifications(items: List[Dict[str, object]]) -> None:
+    url = f"{NOTIFY_URL}/batch"
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = requests.post(url, json=data, timeout=5)
+            response = notify_session.post(url, json=items, timeout=5)
             if response.status_code == 200:
-                logger.info("Go サーバーに通知成功")
+                logger.info(f"Go サーバーに通知成功 ({len(items)} 件)")
                 return
             else:
                 logger.error(f"Go サーバーへの通知失敗: ステータスコード {response.status_code}")
         except Exception as e:
             logger.error(f"Go サーバーへの通知エラー (試行 {attempt + 1}/{max_retries}): {e}")
         time.sleep(1)
-    logger.error("Go サーバーへの通知が最大試行回数に達しました")
+    logger.error(f"Go サーバーへの通知が最大試行回数に達しました ({len(items)} 件を破棄)")
 
-def execute_trade(triangle: str, direction: str, prices: Dict[str, Dict[str, float]], amount: float) -> None:
+def notify_worker() -> None:
+    while True:
+        items = [notify_queue.get()]
+        time.sleep(NOTIFY_BATCH_INTERVAL)  # 直後に続く通知を同じリクエストにまとめる
+        while True:
+            try:
+                items.append(notify_queue.get_nowait())
+            except queue.Empty:
+                break
+        post_notifications(items)
+
+class PricesTuple(NamedTuple):
+    """三角形のペア順 [p0, p1, p2] に並べた気配値のスナップショット"""
+    p0_bid: float
+    p0_ask: float
+    p1_bid: float
+    p1_ask: float
+    p2_bid: float
+    p2_ask: float
+
+def execute_trade(triangle: str, direction: str, prices: PricesTuple, amount: float) -> None:
+    p0, p1, p2 = TRIANGLES[triangle]
     try:
-        if triangle == "BTC-ETH-USDT":
-            if direction == "順方向":
-                binance.create_market_sell_order('BTC/USDT', amount / prices['BTC/USDT']['ask'])
-                binance.create_market_sell_order('ETH/BTC', amount / prices['BTC/USDT']['ask'] / prices['ETH/BTC']['ask'])
-                binance.create_market_buy_order('ETH/USDT', amount / prices['BTC/USDT']['ask'] / prices['ETH/BTC']['ask'])
-            else:
-                binance.create_market_sell_order('ETH/USDT', amount / prices['ETH/USDT']['ask'])
-                binance.create_market_buy_order('ETH/BTC', amount / prices['ETH/USDT']['ask'])
-                binance.create_market_buy_order('BTC/USDT', amount / prices['ETH/USDT']['ask'] * prices['ETH/BTC']['bid'])
-        else:  # BNB-BTC-USDT
-            if direction == "順方向":
-                binance.create_market_sell_order('BNB/BTC', amount / prices['BNB/BTC']['ask'])
-                binance.create_market_sell_order('BTC/USDT', amount / prices['BNB/BTC']['ask'] / prices['BTC/USDT']['ask'])
-                binance.create_market_buy_order('BNB/USDT', amount / prices['BNB/BTC']['ask'] / prices['BTC/USDT']['ask'])
-            else:
-                binance.create_market_sell_order('BNB/USDT', amount / prices['BNB/USDT']['ask'])
-                binance.create_market_buy_order('BTC/USDT', amount / prices['BNB/USDT']['ask'])
-                binance.create_market_buy_order('BNB/BTC', amount / prices['BNB/USDT']['ask'] * prices['BTC/USDT']['bid'])
+        if direction == "順方向":
+            qty_a = amount / prices.p0_ask
+            qty_b = qty_a / prices.p1_ask
+            binance.create_market_sell_order(p0, qty_a)
+            binance.create_market_sell_order(p1, qty_b)
+            binance.create_market_buy_order(p2, qty_b)
+        else:
+            qty_a = amount / prices.p2_ask
+            qty_b = qty_a * prices.p1_bid
+            binance.create_market_sell_order(p2, qty_a)
+            binance.create_market_buy_order(p1, qty_a)
+            binance.create_market_buy_order(p0, qty_b)
         logger.info(f"取引実行: {triangle} {direction} 成功")
     except Exception as e:
         logger.error(f"取引実行エラー {triangle} {direction}: {e}")
 
 def live_triangular_arbitrage() -> None:
-    triangles = {
-        "BTC-ETH-USDT": ['BTC/USDT', 'ETH/BTC', 'ETH/USDT'],
-        "BNB-BTC-USDT": ['BNB/BTC', 'BTC/USDT', 'BNB/USDT']
-    }
-    unique_pairs = list(set(pair for triangle in triangles.values() for pair in triangle))
-    unique_pairs_lower = [pair.replace('/', '').lower() for pair in unique_pairs]
-
     binance_fee_rate = 0.001  # 0.1%
     slippage_tolerance = 0.01
     max_profit_threshold = 5.0
     profit_rates_history: List[float] = []
 
+    # compute_profits を事前にコンパイルしておく (初回呼び出しの JIT 待ちを避ける)
+    compute_profits(1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 666.67, 0.0, 1 - binance_fee_rate)
+
     # 初期データを取得（WebSocket がデータを取得するまでの準備）
-    for pair in unique_pairs:
-        symbol = pair.replace('/', '').lower()
+    for pair, symbol in SYM.items():
         try:
             order_book = fetch_order_book(pair)
             if order_book:
                 order_books[symbol] = order_book
-            ohlcv = binance.fetch_ohlcv(pair, '1m', limit=10)
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
-            df['bid'] = df['close'] * 0.999
-            recent_prices[symbol] = df
+            for c in fetch_recent_prices(pair, limit=RING_SIZE)[:, 4].tolist():
+                recent_prices.append(SYMBOL_IDS[symbol], c)
         except Exception as e:
             logger.error(f"初期データ取得エラー {pair}: {e}")
+    _check_data_ready()
 
     # WebSocket スレッドを開始
     ws_thread = threading.Thread(target=start_websocket)
     ws_thread.daemon = True
     ws_thread.start()
 
+    # Go サーバーへの通知スレッドを開始
+    notify_thread = threading.Thread(target=notify_worker)
+    notify_thread.daemon = True
+    notify_thread.start()
+
     # WebSocket データが揃うまで待機
     logger.info("WebSocket データが揃うのを待機中...")
-    while True:
-        with lock:
-            if all(pair in order_books and pair in recent_prices for pair in unique_pairs_lower):
-                logger.info("WebSocket データが揃いました")
-                break
-        time.sleep(1)
+    data_ready.wait()
+    logger.info("WebSocket データが揃いました")
 
+    tick = TickSnapshot()
     while True:
-        for triangle, pairs in triangles.items():
-            prices: Dict[str, Dict[str, float]] = {}
-            recent_data: Dict[str, pd.DataFrame] = {}
-            for pair in pairs:
-                symbol = pair.replace('/', '').lower()
-                with lock:
-                    if symbol not in order_books or symbol not in recent_prices:
-                        logger.warning(f"{pair}: WebSocket データがまだありません")
-                        continue
-                    prices[pair] = order_books[symbol]
-                    recent_data[pair] = recent_prices[symbol]
-                    # 価格をログに出力
-                    logger.info(f"{pair}: bid={prices[pair]['bid']:.2f}, ask={prices[pair]['ask']:.2f}")
-
-            if not recent_data[pairs[0]].empty:
-                volatility = check_volatility(recent_data[pairs[0]], len(recent_data[pairs[0]]) - 1)
+        if not tick.load(order_books):
+            logger.warning("WebSocket データがまだありません")
+            update_event.wait(timeout=0.1)
+            update_event.clear()
+            continue
+
+        for triangle, pairs in TRIANGLES.items():
+            base_id = TRIANGLE_INDICES[triangle][0]
+            if recent_prices.counts[base_id]:
+                # 価格に依存しないゲートを先に評価し、棄却される場合は価格の取り出しや計算を行わない
+                volatility = check_volatility(base_id)
                 if volatility > 5:
                     logger.info(f"{triangle}: ボラティリティが高い ({volatility:.2f}%)、スキップ")
                     continue
 
-                trend = get_trend(recent_data[pairs[0]], len(recent_data[pairs[0]]) - 1)
-                min_profit_rate = calculate_dynamic_threshold(profit_rates_history, volatility)
-
                 start_usdt = 666.67
                 slippage = calculate_slippage(start_usdt, volatility)
                 if slippage > slippage_tolerance:
@@ -292,30 +425,19 @@ def live_triangular_arbitrage() -> None:
                     continue
                 fee = 1 - binance_fee_rate
 
-                # 順方向の計算
-                if triangle == "BTC-ETH-USDT":
-                    btc = start_usdt / (prices['BTC/USDT']['ask'] * (1 + slippage)) * fee
-                    eth = btc / (prices['ETH/BTC']['ask'] * (1 + slippage)) * fee
-                    final_usdt = eth * prices['ETH/USDT']['bid'] * (1 - slippage) * fee
-                else:
-                    bnb = start_usdt / (prices['BNB/BTC']['ask'] * (1 + slippage)) * fee
-                    btc = bnb / (prices['BTC/USDT']['ask'] * (1 + slippage)) * fee
-                    final_usdt = btc * prices['BNB/USDT']['bid'] * (1 - slippage) * fee
-                profit_rate = (final_usdt - start_usdt) / start_usdt * 100
+                trend = get_trend(base_id)
+                min_profit_rate = calculate_dynamic_threshold(profit_rates_history, volatility)
+
+                legs = TRIANGLE_LEGS[triangle](tick)
+                # 価格をログに出力
+                for pair, bid, ask in zip(pairs, legs[0::2], legs[1::2]):
+                    logger.info(f"{pair}: bid={bid:.2f}, ask={ask:.2f}")
+
+                profit_rate, profit_rate_reverse = compute_profits(*legs, start_usdt, slippage, fee)
+
                 if trend == "up":
                     profit_rate += 0.2
                 logger.info(f"{triangle} 順方向の利益率: {profit_rate:.2f}%")
-
-                # 逆方向の計算
-                if triangle == "BTC-ETH-USDT":
-                    eth_reverse = start_usdt / (prices['ETH/USDT']['ask'] * (1 + slippage)) * fee
-                    btc_reverse = eth_reverse * prices['ETH/BTC']['bid'] * (1 - slippage) * fee
-                    final_usdt_reverse = btc_reverse * prices['BTC/USDT']['bid'] * (1 - slippage) * fee
-                else:
-                    bnb_reverse = start_usdt / (prices['BNB/USDT']['ask'] * (1 + slippage)) * fee
-                    btc_reverse = bnb_reverse * prices['BTC/USDT']['bid'] * (1 - slippage) * fee
-                    final_usdt_reverse = btc_reverse * prices['BNB/BTC']['bid'] * (1 - slippage) * fee
-                profit_rate_reverse = (final_usdt_reverse - start_usdt) / start_usdt * 100
                 if trend == "down":
                     profit_rate_reverse += 0.2
                 logger.info(f"{triangle} 逆方向の利益率: {profit_rate_reverse:.2f}%")
@@ -335,9 +457,11 @@ def live_triangular_arbitrage() -> None:
                     logger.info(f"利益検出: {triangle} {direction} 利益率 {selected_rate:.2f}% ({profit_usdt:.2f} USDT) "
                                f"(volatility={volatility:.2f}%, slippage={slippage:.4f}, trend={trend}, threshold={min_profit_rate:.2f}%)")
                     notify_go_server(triangle, direction, selected_rate, profit_usdt, volatility, slippage, trend, min_profit_rate)
-                    execute_trade(triangle, direction, prices, start_usdt)
+                    execute_trade(triangle, direction, PricesTuple(*legs), start_usdt)
 
-        time.sleep(0.01)
+        # 板が更新されるまで待機 (更新がなくても 0.1 秒ごとに再評価する)
+        update_event.wait(timeout=0.1)
+        update_event.clear()
 
 if __name__ == "__main__":
     live_triangular_arbitrage()
\ No newline at end of file
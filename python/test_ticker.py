@@ -1,10 +1,18 @@
 import ccxt
+import numpy as np
+from numba import njit, prange
 import pandas as pd
 import os
 import logging
+import math
+import time
+import tempfile
 from logging.handlers import RotatingFileHandler
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from typing import Optional
 
 logger = logging.getLogger('arbitrage_backtest')
 logger.setLevel(logging.INFO)
@@ -31,74 +39,232 @@ binance = ccxt.binance({
 })
 binance.set_sandbox_mode(True)
 
+CACHE_DIR = '.cache'
+PAGE_FETCH_WORKERS = 8  # 1シンボルあたりのページ並列取得数
+
 def fetch_historical_data(symbol: str, timeframe: str, since: str, end: str, limit: int = 1000) -> pd.DataFrame:
+    # 取得済みの OHLCV は (symbol, timeframe, since, end) ごとに parquet でキャッシュする
+    cache_name = f"{symbol.replace('/', '_')}_{timeframe}_{since}_{end}".replace(':', '')
+    cache_path = os.path.join(CACHE_DIR, f"{cache_name}.parquet")
+    df = None
+    if os.path.exists(cache_path):
+        try:
+            df = pd.read_parquet(cache_path)
+            logger.info(f"キャッシュから読み込み: {symbol}, {cache_path}")
+        except Exception as e:
+            logger.warning(f"キャッシュ読み込みエラー {cache_path}、再取得します: {e}")
+    if df is None:
+        df = download_historical_data(symbol, timeframe, since, end, limit)
+        # 取得に失敗したページがあれば空で返るので、キャッシュには完全な系列だけが残る
+        if df.empty:
+            return df
+        write_cache(df, cache_path)
+
+    df['bid'] = df['close'] * 0.999
+    df['ask'] = df['close'] * 1.001
+    # 価格は float32 で十分な精度があるため、ループで読む帯域を半分にする (利益率の計算自体は float64)
+    price_columns = ['open', 'high', 'low', 'close', 'bid', 'ask']
+    df[price_columns] = df[price_columns].astype(np.float32)
+    logger.info(f"{symbol}: 総データポイント数 {len(df)}, 範囲 {df['timestamp'].min()} - {df['timestamp'].max()}")
+    return df
+
+def write_cache(df: pd.DataFrame, cache_path: str) -> None:
+    """一時ファイルに書いてから置き換え、中断されても壊れたキャッシュを残さない"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.warning(f"キャッシュ書き込みエラー {cache_path}: {e}")
+        os.remove(tmp_path)
+
+def fetch_ohlcv_page(symbol: str, timeframe: str, since_timestamp: int, limit: int, max_retries: int = 3) -> Optional[list]:
+    """1ページ分の OHLCV を返す。再試行しても取得できなければ None を返す"""
+    for attempt in range(max_retries):
+        try:
+            ohlcv = binance.fetch_ohlcv(symbol, timeframe, since=since_timestamp, limit=limit)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"{symbol}: ページ取得 {pd.to_datetime(since_timestamp, unit='ms')} から {len(ohlcv)} 件")
+            return ohlcv
+        except Exception as e:
+            logger.error(f"データ取得エラー {symbol} (since={since_timestamp}, 試行 {attempt + 1}/{max_retries}): {e}")
+            if attempt + 1 < max_retries:
+                time.sleep(2 ** attempt)
+    logger.error(f"{symbol}: ページ {pd.to_datetime(since_timestamp, unit='ms')} を取得できませんでした")
+    return None
+
+def download_historical_data(symbol: str, timeframe: str, since: str, end: str, limit: int = 1000) -> pd.DataFrame:
     since_timestamp = binance.parse8601(since)
     end_timestamp = binance.parse8601(end)
     if since_timestamp is None or end_timestamp is None:
         logger.error("日付パースに失敗")
         return pd.DataFrame()
     
-    logger.info(f"データ取得開始: {symbol}, 開始 {since}, 終了 {end}")
-    all_data = []
-    current_timestamp = since_timestamp
-
-    while current_timestamp < end_timestamp:
-        try:
-            ohlcv = binance.fetch_ohlcv(symbol, timeframe, since=current_timestamp, limit=limit)
-            if not ohlcv:
-                logger.warning(f"{symbol}: データが取得できず終了")
-                break
-            all_data.extend(ohlcv)
-            current_timestamp = ohlcv[-1][0] + 1
-            logger.debug(f"{symbol}: 取得済みデータポイント {len(all_data)}, 最新タイムスタンプ {pd.to_datetime(ohlcv[-1][0], unit='ms')}")
-            if len(ohlcv) < limit:
-                break
-        except Exception as e:
-            logger.error(f"データ取得エラー {symbol}: {e}")
-            break
+    # ページ境界は取得前に決まるので、全ページを並列に取得する
+    timeframe_ms = binance.parse_timeframe(timeframe) * 1000
+    page_ms = limit * timeframe_ms
+    # end ちょうどに始まるバーも含めるため、区間に1本分を足してページ数を求める
+    pages = math.ceil((end_timestamp - since_timestamp + timeframe_ms) / page_ms)
+    page_starts = [since_timestamp + i * page_ms for i in range(pages)]
+    logger.info(f"データ取得開始: {symbol}, 開始 {since}, 終了 {end}, ページ数 {pages}")
+    with ThreadPoolExecutor(max_workers=PAGE_FETCH_WORKERS) as executor:
+        page_results = list(executor.map(lambda page_start: fetch_ohlcv_page(symbol, timeframe, page_start, limit),
+                                         page_starts))
+    # 途中のページが丸ごと欠けた系列は使わない (取引所側の数本の欠損はバックテスト側で時刻を揃えて吸収する)
+    if any(page is None for page in page_results):
+        logger.error(f"{symbol}: 取得できなかったページがあるため、データを破棄します")
+        return pd.DataFrame()
+    all_data = [row for page in page_results for row in page]
     
     if not all_data:
         logger.error(f"{symbol}: データが全く取得できませんでした")
         return pd.DataFrame()
 
-    df = pd.DataFrame(all_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
-    df['bid'] = df['close'] * 0.999
-    df['ask'] = df['close'] * 1.001
-    df = df[(df['timestamp'] >= pd.to_datetime(since, utc=True)) & (df['timestamp'] <= pd.to_datetime(end, utc=True))]
-    logger.info(f"{symbol}: 総データポイント数 {len(df)}, 範囲 {df['timestamp'].min()} - {df['timestamp'].max()}")
+    # ページ間の重複を除いて時刻順に並べ、範囲外の切り落としはミリ秒列の二分探索で行う
+    ohlcv_array = np.asarray(all_data, dtype=np.float64)
+    _, first_rows = np.unique(ohlcv_array[:, 0], return_index=True)
+    ohlcv_array = ohlcv_array[first_rows]
+    lo = np.searchsorted(ohlcv_array[:, 0], since_timestamp)
+    hi = np.searchsorted(ohlcv_array[:, 0], end_timestamp, side='right')
+    ohlcv_array = ohlcv_array[lo:hi]
+
+    df = pd.DataFrame(ohlcv_array, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(ohlcv_array[:, 0].astype(np.int64), unit='ms', utc=True)
     return df
 
-def check_volatility(df: pd.DataFrame, index: int) -> float:
-    start = max(0, index - 4)
-    prices = df['close'][start:index + 1]
-    return (max(prices) - min(prices)) / min(prices) * 100 if len(prices) > 1 else 0
+def rolling_volatility(close: np.ndarray, window: int = 5) -> np.ndarray:
+    """各バーについて直近 window 本の終値の (最大 - 最小) / 最小 * 100 を返す"""
+    # 先頭を close[0] で埋めて、window 本に満たない区間も同じ幅の窓で扱う
+    padded = np.concatenate([np.full(window - 1, close[0]), close])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    vmax = windows.max(axis=-1)
+    vmin = windows.min(axis=-1)
+    return (vmax - vmin) / vmin * 100
 
-def get_trend(df: pd.DataFrame, index: int) -> str:
-    start = max(0, index - 9)
-    sma = df['close'][start:index + 1].mean()
-    current_price = df['bid'][index]
-    return "up" if current_price > sma else "down"
+def get_trend(close: np.ndarray, bid: np.ndarray, window: int = 10) -> np.ndarray:
+    """各バーの bid が直近 window 本の終値 SMA を上回れば "up"、それ以外は "down" を返す"""
+    cumsum = np.cumsum(close, dtype=np.float64)  # float32 入力でも累積誤差が出ないよう float64 で積算する
+    window_sum = cumsum.copy()
+    window_sum[window:] -= cumsum[:-window]
+    sma = window_sum / np.minimum(np.arange(1, len(close) + 1), window)
+    return np.where(bid > sma, "up", "down")
 
+@njit(cache=True)
 def calculate_slippage(amount: float, volatility: float) -> float:
     base_slippage = 0.0015 * (amount / 666.67)
     volatility_factor = 1 + (volatility / 10)
     return min(base_slippage * volatility_factor, 0.005)
 
-def calculate_dynamic_threshold(profit_rates: list[float], volatility: float) -> float:
-    base = 0.12
-    positive_rates = [r for r in profit_rates[-10:] if r > 0]
-    if positive_rates:
-        recent_mean = sum(positive_rates) / len(positive_rates)
-        base += recent_mean * 0.3
-    return max(base, 0.12) + (0.2 if volatility > 1 else 0.05)
-
-def filter_outliers(rates: list[float]) -> list[float]:
-    if not rates:
-        return []
-    mean = sum(rates) / len(rates)
-    std_dev = (sum((x - mean) ** 2 for x in rates) / len(rates)) ** 0.5
-    return [r for r in rates if abs(r - mean) <= 2 * std_dev]
+@njit(cache=True)
+def compute_thresholds(forward_rates: np.ndarray, reverse_rates: np.ndarray, volatility: np.ndarray) -> np.ndarray:
+    """各バーの動的閾値を返す
+
+    直近10件の利益率 (バーごとに順方向・逆方向の順で追加) を長さ10のリングバッファに保持し、
+    そのうち正の値の合計と件数を追加・追い出しのたびに更新する。
+    """
+    n = len(forward_rates)
+    thresholds = np.empty(n)
+    recent_rates = np.zeros(10)
+    filled = 0
+    pos = 0
+    positive_sum = 0.0
+    positive_count = 0
+    for k in range(n):
+        base = 0.12
+        if positive_count > 0:
+            base += positive_sum / positive_count * 0.3
+        thresholds[k] = max(base, 0.12) + (0.2 if volatility[k] > 1 else 0.05)
+
+        for rate in (forward_rates[k], reverse_rates[k]):
+            if filled == 10:
+                evicted = recent_rates[pos]
+                if evicted > 0:
+                    positive_sum -= evicted
+                    positive_count -= 1
+            else:
+                filled += 1
+            recent_rates[pos] = rate
+            if rate > 0:
+                positive_sum += rate
+                positive_count += 1
+            pos = (pos + 1) % 10
+    return thresholds
+
+@njit(cache=True, parallel=True)
+def backtest_kernel(p0_bid: np.ndarray, p0_ask: np.ndarray, p1_bid: np.ndarray, p1_ask: np.ndarray,
+                    p2_bid: np.ndarray, p2_ask: np.ndarray, volatility: np.ndarray, trend_up: np.ndarray,
+                    start_usdt: float, fee: float, slippage_tolerance: float):
+    """全バーの利益率・閾値・取引判定をまとめて計算する
+
+    利益率と判定はバーごとに独立なので prange で並列化し、過去の利益率に依存する閾値だけを逐次に求める。
+    ボラティリティとスリッページの判定を先に行い、無効なバーでは利益率を計算しない。
+    direction_code は 1 が順方向、-1 が逆方向。
+    """
+    n = len(p0_bid)
+    profit_rate = np.full(n, np.nan)
+    profit_rate_reverse = np.full(n, np.nan)
+    slippage = np.full(n, np.nan)
+    valid = np.zeros(n, dtype=np.bool_)
+    for i in prange(n):
+        # 無効なバーは利益率を計算せずに NaN のまま残す
+        if volatility[i] > 5:
+            continue
+        s = calculate_slippage(start_usdt, volatility[i])
+        slippage[i] = s
+        if s > slippage_tolerance:
+            continue
+        valid[i] = True
+
+        # 順方向: p0 を ask で買い → p1 を ask で買い → p2 を bid で売り
+        leg1 = start_usdt / (p0_ask[i] * (1 + s)) * fee
+        leg2 = leg1 / (p1_ask[i] * (1 + s)) * fee
+        final_usdt = leg2 * p2_bid[i] * (1 - s) * fee
+        forward = (final_usdt - start_usdt) / start_usdt * 100
+
+        # 逆方向: p2 を ask で買い → p1 を bid で売り → p0 を bid で売り
+        leg1_reverse = start_usdt / (p2_ask[i] * (1 + s)) * fee
+        leg2_reverse = leg1_reverse * p1_bid[i] * (1 - s) * fee
+        final_usdt_reverse = leg2_reverse * p0_bid[i] * (1 - s) * fee
+        reverse = (final_usdt_reverse - start_usdt) / start_usdt * 100
+
+        if trend_up[i]:
+            forward += 0.15
+        else:
+            reverse += 0.15
+        profit_rate[i] = forward
+        profit_rate_reverse[i] = reverse
+
+    # 閾値は有効なバーの利益率の履歴に依存する
+    valid_indices = np.flatnonzero(valid)
+    min_profit_rate = np.zeros(n)
+    min_profit_rate[valid_indices] = compute_thresholds(profit_rate[valid_indices], profit_rate_reverse[valid_indices],
+                                                        volatility[valid_indices])
+
+    trade_mask = np.zeros(n, dtype=np.bool_)
+    skipped = np.zeros(n, dtype=np.bool_)
+    direction_code = np.zeros(n, dtype=np.int8)
+    for i in prange(n):
+        if not valid[i]:
+            continue
+        if trend_up[i]:
+            below_threshold = profit_rate[i] <= min_profit_rate[i]
+        else:
+            below_threshold = profit_rate_reverse[i] <= min_profit_rate[i]
+        if below_threshold:
+            skipped[i] = profit_rate[i] > 0 or profit_rate_reverse[i] > 0
+        else:
+            trade_mask[i] = True
+            direction_code[i] = 1 if profit_rate[i] > profit_rate_reverse[i] else -1
+    return profit_rate, profit_rate_reverse, slippage, valid, min_profit_rate, trade_mask, skipped, direction_code
+
+def filter_outliers(rates) -> np.ndarray:
+    a = np.asarray(rates, dtype=np.float64)
+    if a.size == 0:
+        return a
+    mean, std_dev = a.mean(), a.std()
+    return a[np.abs(a - mean) <= 2 * std_dev]
 
 def backtest_triangular_arbitrage(start_date: str, end_date: str):
     logger.info(f"バックテスト呼び出し: 開始 {start_date}, 終了 {end_date}")
@@ -107,120 +273,102 @@ def backtest_triangular_arbitrage(start_date: str, end_date: str):
         "BNB-BTC-USDT": ['BNB/BTC', 'BTC/USDT', 'BNB/USDT']
     }
     
-    data = {}
-    for triangle, pairs in triangles.items():
-        data[triangle] = {}
-        for pair in pairs:
-            df = fetch_historical_data(pair, '1m', start_date, end_date, limit=1000)
-            if df.empty:
-                logger.error(f"{pair} のデータが空です。バックテストをスキップします")
-                return
-            data[triangle][pair] = df
+    # 各ペアは独立しているので並列に取得する (両三角形で共通の BTC/USDT は1回だけ)
+    unique_pairs = list(dict.fromkeys(pair for pairs in triangles.values() for pair in pairs))
+    with ThreadPoolExecutor(max_workers=len(unique_pairs)) as executor:
+        futures = {pair: executor.submit(fetch_historical_data, pair, '1m', start_date, end_date, limit=1000)
+                   for pair in unique_pairs}
+
+    pair_data: dict[str, pd.DataFrame] = {}
+    for pair in unique_pairs:
+        df = futures[pair].result()
+        if df.empty:
+            logger.error(f"{pair} のデータが空です。バックテストをスキップします")
+            return
+        pair_data[pair] = df
 
     binance_fee_rate = 0.00075
     slippage_tolerance = 0.005
     max_profit_threshold = 5.0
+    start_usdt = 666.67
+    fee = 1 - binance_fee_rate
+    fee_usdt = binance_fee_rate * 3 * start_usdt
 
     results = []
-    profit_rates_log = []
-    skipped_trades = []
+    skipped_trades: dict[str, list] = {triangle: [] for triangle in triangles}
 
     for triangle, pairs in triangles.items():
-        df_length = min(len(data[triangle][pair]) for pair in pairs)
+        # ペアごとに開始時刻や欠損が異なりうるので、位置ではなく全ペアに共通するタイムスタンプで揃える
+        pair_timestamps = [pair_data[pair]['timestamp'].to_numpy() for pair in pairs]
+        timestamps = reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), pair_timestamps)
+        rows = [np.searchsorted(pair_ts, timestamps) for pair_ts in pair_timestamps]
+        df_length = len(timestamps)
         logger.info(f"バックテスト開始: {triangle}, データポイント数: {df_length}")
+        if df_length == 0:
+            logger.error(f"{triangle}: 全ペアに共通するバーがありません。スキップします")
+            continue
 
-        forward_rates_history = []
-        reverse_rates_history = []
+        # 各ペアの bid/ask をペア順 [p0, p1, p2] の配列として1度だけ取り出す (SoA)
+        bids = tuple(pair_data[pair]['bid'].to_numpy()[pair_rows] for pair, pair_rows in zip(pairs, rows))
+        asks = tuple(pair_data[pair]['ask'].to_numpy()[pair_rows] for pair, pair_rows in zip(pairs, rows))
+        p0_bid, p1_bid, p2_bid = bids
+        p0_ask, p1_ask, p2_ask = asks
+        # 記録用の列名 ({symbol}_bid / {symbol}_ask) と配列の組も三角形ごとに1度だけ作る
+        price_columns = [(f"{pair.replace('/', '').lower()}_{side}", prices)
+                         for pair, pair_bid, pair_ask in zip(pairs, bids, asks)
+                         for side, prices in (('bid', pair_bid), ('ask', pair_ask))]
+        base_close = pair_data[pairs[0]]['close'].to_numpy()[rows[0]]
 
-        for i in range(df_length):
-            prices = {pair: {'bid': data[triangle][pair]['bid'][i], 'ask': data[triangle][pair]['ask'][i]} for pair in pairs}
-            volatility = check_volatility(data[triangle][pairs[0]], i)
-            if volatility > 5:
-                continue
+        volatility = rolling_volatility(base_close)
+        trend = get_trend(base_close, p0_bid)
+        trend_up = trend == "up"
 
-            trend = get_trend(data[triangle][pairs[0]], i)
-            min_profit_rate = calculate_dynamic_threshold(forward_rates_history + reverse_rates_history, volatility)
+        (profit_rate, profit_rate_reverse, slippage, valid, min_profit_rate,
+         trade_mask, skipped, direction_code) = backtest_kernel(p0_bid, p0_ask, p1_bid, p1_ask, p2_bid, p2_ask,
+                                                                volatility, trend_up, start_usdt, fee, slippage_tolerance)
 
-            start_usdt = 666.67
-            slippage = calculate_slippage(start_usdt, volatility)
-            if slippage > slippage_tolerance:
-                continue
-            fee = 1 - binance_fee_rate
-            if triangle == "BTC-ETH-USDT":
-                btc = start_usdt / (prices['BTC/USDT']['ask'] * (1 + slippage)) * fee
-                eth = btc / (prices['ETH/BTC']['ask'] * (1 + slippage)) * fee
-                final_usdt = eth * prices['ETH/USDT']['bid'] * (1 - slippage) * fee
-            else:
-                bnb = start_usdt / (prices['BNB/BTC']['ask'] * (1 + slippage)) * fee
-                btc = bnb / (prices['BTC/USDT']['ask'] * (1 + slippage)) * fee
-                final_usdt = btc * prices['BNB/USDT']['bid'] * (1 - slippage) * fee
-            profit_rate = (final_usdt - start_usdt) / start_usdt * 100
-            if trend == "up":
-                profit_rate += 0.15
-
-            start_usdt_reverse = 666.67
-            if triangle == "BTC-ETH-USDT":
-                eth_reverse = start_usdt_reverse / (prices['ETH/USDT']['ask'] * (1 + slippage)) * fee
-                btc_reverse = eth_reverse * prices['ETH/BTC']['bid'] * (1 - slippage) * fee
-                final_usdt_reverse = btc_reverse * prices['BTC/USDT']['bid'] * (1 - slippage) * fee
-            else:
-                bnb_reverse = start_usdt_reverse / (prices['BNB/USDT']['ask'] * (1 + slippage)) * fee
-                btc_reverse = bnb_reverse * prices['BTC/USDT']['bid'] * (1 - slippage) * fee
-                final_usdt_reverse = btc_reverse * prices['BNB/BTC']['bid'] * (1 - slippage) * fee
-            profit_rate_reverse = (final_usdt_reverse - start_usdt_reverse) / start_usdt_reverse * 100
-            if trend == "down":
-                profit_rate_reverse += 0.15
-
-            forward_rates_history.append(profit_rate)
-            reverse_rates_history.append(profit_rate_reverse)
-
-            profit_rates_log.append({
-                'timestamp': data[triangle][pairs[0]]['timestamp'][i],
-                'triangle': triangle,
-                'profit_rate_forward': profit_rate,
-                'profit_rate_reverse': profit_rate_reverse,
-                'volatility': volatility,
-                'slippage': slippage,
-                'prices': prices,
-                'trend': trend,
-                'min_profit_rate': min_profit_rate
-            })
+        # 有効なバーの記録は列ごとの配列で保持する
+        valid_indices = np.flatnonzero(valid)
+        log_forward = profit_rate[valid_indices]
+        log_reverse = profit_rate_reverse[valid_indices]
+        log_slippage = slippage[valid_indices]
+        log_thresholds = min_profit_rate[valid_indices]
 
-            if (trend == "up" and profit_rate <= min_profit_rate) or (trend == "down" and profit_rate_reverse <= min_profit_rate):
-                if profit_rate > 0 or profit_rate_reverse > 0:
-                    skipped_trades.append({
-                        'triangle': triangle,
-                        'profit_rate': max(profit_rate, profit_rate_reverse),
-                        'timestamp': data[triangle][pairs[0]]['timestamp'][i]
-                    })
-                continue
+        skipped_for_triangle = skipped_trades[triangle]
+        for i in np.flatnonzero(skipped):
+            skipped_for_triangle.append({
+                'profit_rate': max(profit_rate[i], profit_rate_reverse[i]),
+                'timestamp': timestamps[i]
+            })
 
-            if profit_rate > min_profit_rate or profit_rate_reverse > min_profit_rate:
-                direction = "順方向" if profit_rate > profit_rate_reverse else "逆方向"
-                selected_rate = max(profit_rate, profit_rate_reverse)
-                if selected_rate > max_profit_threshold:
+        # 閾値を超えたバーだけ取引として記録する
+        for i in np.flatnonzero(trade_mask):
+            direction = "順方向" if direction_code[i] > 0 else "逆方向"
+            selected_rate = max(profit_rate[i], profit_rate_reverse[i])
+            if selected_rate > max_profit_threshold:
+                if logger.isEnabledFor(logging.DEBUG):
                     logger.debug(f"{triangle} {i}: 異常値としてスキップ (profit_rate={selected_rate:.2f}%)")
-                    continue
-                if selected_rate <= 0:
-                    logger.warning(f"{triangle} {i}: マイナス利益検出 (profit_rate={selected_rate:.2f}%)、スキップ")
-                    continue
-                profit_usdt = start_usdt * selected_rate / 100
-                result = {
-                    'timestamp': data[triangle][pairs[0]]['timestamp'][i],
-                    'triangle': triangle,
-                    'direction': direction,
-                    'profit_rate': selected_rate,
-                    'profit_usdt': profit_usdt,
-                    'slippage': slippage * start_usdt,
-                    'fee': binance_fee_rate * 3 * start_usdt,
-                    'volatility': volatility,
-                    'prices': prices,
-                    'trend': trend,
-                    'min_profit_rate': min_profit_rate
-                }
-                results.append(result)
-                logger.info(f"利益検出: {triangle} {direction} 利益率 {selected_rate:.2f}% ({profit_usdt:.2f} USDT) at {result['timestamp']} "
-                           f"(volatility={volatility:.2f}%, slippage={slippage:.4f}, trend={trend}, threshold={min_profit_rate:.2f}%)")
+                continue
+            if selected_rate <= 0:
+                logger.warning(f"{triangle} {i}: マイナス利益検出 (profit_rate={selected_rate:.2f}%)、スキップ")
+                continue
+            profit_usdt = start_usdt * selected_rate / 100
+            result = {
+                'timestamp': timestamps[i],
+                'triangle': triangle,
+                'direction': direction,
+                'profit_rate': selected_rate,
+                'profit_usdt': profit_usdt,
+                'slippage': slippage[i] * start_usdt,
+                'fee': fee_usdt,
+                'volatility': volatility[i],
+                **{column: prices[i] for column, prices in price_columns},
+                'trend': trend[i],
+                'min_profit_rate': min_profit_rate[i]
+            }
+            results.append(result)
+            logger.info(f"利益検出: {triangle} {direction} 利益率 {selected_rate:.2f}% ({profit_usdt:.2f} USDT) at {result['timestamp']} "
+                       f"(volatility={volatility[i]:.2f}%, slippage={slippage[i]:.4f}, trend={trend[i]}, threshold={min_profit_rate[i]:.2f}%)")
 
         if results:
             avg_profit = sum(r['profit_rate'] for r in results) / len(results)
@@ -228,32 +376,42 @@ def backtest_triangular_arbitrage(start_date: str, end_date: str):
             logger.info(f"バックテスト結果 {triangle}: 平均利益率 {avg_profit:.2f}%, 取引回数 {len(results)}, 純利益 {total_profit:.2f} USDT")
         else:
             logger.info(f"{triangle}: 利益機会なし")
-            avg_slippage = sum(log['slippage'] for log in profit_rates_log if log['triangle'] == triangle) / len(profit_rates_log)
-            avg_threshold = sum(log['min_profit_rate'] for log in profit_rates_log if log['triangle'] == triangle) / len(profit_rates_log)
-            logger.info(f"{triangle} 統計: 平均スリッページ={avg_slippage:.4f}, 平均閾値={avg_threshold:.2f}%")
+            if valid_indices.size:
+                logger.info(f"{triangle} 統計: 平均スリッページ={log_slippage.mean():.4f}, 平均閾値={log_thresholds.mean():.2f}%")
 
-        if skipped_trades:
-            skipped_for_triangle = [t for t in skipped_trades if t['triangle'] == triangle]
+        if skipped_for_triangle:
             skipped_count = len(skipped_for_triangle)
             filtered_skipped = filter_outliers([t['profit_rate'] for t in skipped_for_triangle])
-            avg_skipped_profit = sum(filtered_skipped) / len(filtered_skipped) if filtered_skipped else 0
-            max_skipped_profit = max(filtered_skipped) if filtered_skipped else 0
+            avg_skipped_profit = filtered_skipped.mean() if filtered_skipped.size else 0
+            max_skipped_profit = filtered_skipped.max() if filtered_skipped.size else 0
             logger.info(f"{triangle} スキップされた取引: 件数={skipped_count}, 平均利益率={avg_skipped_profit:.2f}%, 最大利益率={max_skipped_profit:.2f}%")
 
-        forward_rates = filter_outliers([log['profit_rate_forward'] for log in profit_rates_log if log['triangle'] == triangle])
-        reverse_rates = filter_outliers([log['profit_rate_reverse'] for log in profit_rates_log if log['triangle'] == triangle])
-        if forward_rates:
-            logger.info(f"{triangle} 順方向平均利益率: {sum(forward_rates)/len(forward_rates):.4f}%, 最大: {max(forward_rates):.4f}%")
-        if reverse_rates:
-            logger.info(f"{triangle} 逆方向平均利益率: {sum(reverse_rates)/len(reverse_rates):.4f}%, 最大: {max(reverse_rates):.4f}%")
+        forward_rates = filter_outliers(log_forward)
+        reverse_rates = filter_outliers(log_reverse)
+        if forward_rates.size:
+            logger.info(f"{triangle} 順方向平均利益率: {forward_rates.mean():.4f}%, 最大: {forward_rates.max():.4f}%")
+        if reverse_rates.size:
+            logger.info(f"{triangle} 逆方向平均利益率: {reverse_rates.mean():.4f}%, 最大: {reverse_rates.max():.4f}%")
         
-        profit_df = pd.DataFrame(profit_rates_log)
-        profit_df.to_csv(f"profit_rates_{triangle}.csv", index=False)
-        logger.info(f"{triangle} の利益率データを profit_rates_{triangle}.csv に保存しました")
+        profit_df = pd.DataFrame({
+            'timestamp': timestamps[valid_indices],
+            'triangle': triangle,
+            'profit_rate_forward': log_forward,
+            'profit_rate_reverse': log_reverse,
+            'volatility': volatility[valid_indices],
+            'slippage': log_slippage,
+            **{column: prices[valid_indices] for column, prices in price_columns},
+            'trend': trend[valid_indices],
+            'min_profit_rate': log_thresholds
+        })
+        profit_df.to_parquet(f"profit_rates_{triangle}.parquet", index=False)
+        logger.info(f"{triangle} の利益率データを profit_rates_{triangle}.parquet に保存しました")
 
 if __name__ == "__main__":
     # 現在日付（2025年3月20日）から過去30日間をテスト
-    end_date = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-    start_date = (datetime.utcnow() - timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    # キャッシュのキーが実行ごとに変わらないよう、終了時刻は当日 0 時 (UTC) に切り捨てる
+    now = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    end_date = now.strftime("%Y-%m-%dT%H:%M:%SZ")
+    start_date = (now - timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%SZ")
     logger.info(f"直近30日間のバックテストを開始: {start_date} - {end_date}")
     backtest_triangular_arbitrage(start_date, end_date)
\ No newline at end of file